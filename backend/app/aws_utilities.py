@@ -46,4 +46,17 @@ class S3Utilities:
             
         except Exception as error:
             print(f"S3 upload failed: {error}")
-            raise
\ No newline at end of file
+            raise
+
+    def download_from_s3(self, key: str) -> bytes:
+        """Download an object from S3 and return its bytes"""
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)
+            return response['Body'].read()
+        except Exception as error:
+            print(f"S3 download failed: {error}")
+            raise
+
+    def key_from_url(self, url: str) -> str:
+        """Get the object key from a URL returned by upload_to_s3"""
+        return url.split('/')[-1]
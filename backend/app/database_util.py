@@ -1,16 +1,19 @@
+import os
 import chromadb
+import numpy as np
 from chromadb.config import Settings
 
 from PIL import Image
 from util import Utilities
 
 class DatabaseUtilities():
-    def __init__(self, collection_name: str):
+    def __init__(self, collection_name: str = None):
         Utilities.Load_Env()
         self.host = Utilities.get_env_variable('CHROMA_HOST')
         self.port = Utilities.get_env_variable('CHROMA_PORT')
         self.auth_token = Utilities.get_env_variable('CHROMA_AUTH_TOKEN')
         self.collection_name = collection_name
+        self.client = self.get_db_client()
        
         
     def get_db_client(self):
@@ -28,8 +31,69 @@ class DatabaseUtilities():
         except Exception as e:
             raise Exception(f"Error connecting to collection {collection_name}: {str(e)}")
 
+    def export_collection(self, collection, embeddings_path: str, page_size: int = 1000,
+                          include: list = None, normalize: bool = False) -> dict:
+        """
+        Stream a collection's embeddings in chunks into a memory-mapped .npy matrix
+        Args:
+            collection: Chroma collection to export
+            embeddings_path: Path of the .npy file to write
+            page_size: Number of records fetched per get call
+            include: Extra fields to return, e.g. ['metadatas', 'documents']
+            normalize: Scale each row to unit length
+        Returns:
+            dict: 'ids' plus each included field, one entry per matrix row
+        """
+        include = include or []
+        records = {"ids": [], **{field: [] for field in include}}
+
+        # Read every id up front and then fetch by id. Paging by offset would skip
+        # live records whenever a delete shifted the pages. Records added after
+        # this point are left for the next export, and records deleted before
+        # their chunk is read are simply not returned.
+        all_ids = collection.get(include=[])['ids']
+        total = len(all_ids)
+        matrix = None
+        for start in range(0, total, page_size):
+            page = collection.get(ids=all_ids[start:start + page_size], include=['embeddings'] + include)
+            if not page['ids']:
+                continue
+
+            embeddings = np.asarray(page['embeddings'], dtype=np.float32)
+            if matrix is None:
+                matrix = np.lib.format.open_memmap(embeddings_path, mode='w+', dtype=np.float32,
+                                                   shape=(total, embeddings.shape[1]))
+            if normalize:
+                norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+                embeddings = embeddings / np.maximum(norms, 1e-12)
+            offset = len(records['ids'])
+            matrix[offset:offset + len(embeddings)] = embeddings
+
+            records['ids'].extend(page['ids'])
+            for field in include:
+                records[field].extend(page[field])
+
+        if matrix is None:
+            matrix = np.lib.format.open_memmap(embeddings_path, mode='w+', dtype=np.float32, shape=(0, 0))
+        elif len(records['ids']) < total:
+            # Records deleted during the export leave unused rows at the end; copy
+            # the written rows into a matrix of the right size
+            count = len(records['ids'])
+            trimmed_path = f"{embeddings_path}.tmp.npy"
+            trimmed = np.lib.format.open_memmap(trimmed_path, mode='w+', dtype=np.float32,
+                                                shape=(count, matrix.shape[1]))
+            for start in range(0, count, page_size):
+                trimmed[start:start + page_size] = matrix[start:min(start + page_size, count)]
+            trimmed.flush()
+            del trimmed, matrix
+            os.replace(trimmed_path, embeddings_path)
+            return records
+        matrix.flush()
+        del matrix
+        return records
+
 if __name__ == "__main__":
     Utilities.Load_Env
     collection = Utilities.get_env_variable("IMAGE_SEARCH_COLLECTION_NAME")
     db_util = DatabaseUtilities(collection)
-    db_util.connect_image_search_collection()
+    db_util.connect_collection(collection)
@@ -0,0 +1,269 @@
+import json
+import os
+import time
+import numpy as np
+from database_util import DatabaseUtilities
+from migration_state import MigrationState
+from util import Utilities
+
+
+class DuplicateFinder:
+    """
+    Find near-duplicate images and clusters across the whole image collection.
+
+    All stored embeddings are first exported to a memory-mapped .npy matrix.
+    Similarities are then computed block by block (block_size x block_size at
+    a time), keeping only each image's top-k neighbours, so memory stays
+    bounded and the merge step is linear in the number of images. Neighbour
+    pairs are merged with union-find: duplicate groups at a strict threshold,
+    and clusters from mutual neighbours at a lower one, capped at
+    max_cluster_size so that related topics do not chain into one cluster.
+    """
+
+    def __init__(self, output_dir: str = None, block_size: int = 4096, page_size: int = 1000,
+                 duplicate_threshold: float = 0.95, cluster_threshold: float = 0.85,
+                 neighbors: int = 10, max_cluster_size: int = 100):
+        Utilities.Load_Env()
+        self.output_dir = output_dir or Utilities.get_env_variable('DUPLICATES_DIR', 'duplicates')
+        self.block_size = block_size
+        self.page_size = page_size
+        self.duplicate_threshold = duplicate_threshold
+        self.cluster_threshold = cluster_threshold
+        self.neighbors = neighbors
+        self.max_cluster_size = max_cluster_size
+        self.migration_state = MigrationState()
+        self.db_util = DatabaseUtilities()
+        self.status = 'idle'
+        # Error from the most recent scan, if it failed
+        self.last_error = None
+        self._result_cache = (None, None)
+
+    @property
+    def embeddings_path(self) -> str:
+        return os.path.join(self.output_dir, 'embeddings.npy')
+
+    @property
+    def records_path(self) -> str:
+        return os.path.join(self.output_dir, 'records.json')
+
+    @property
+    def result_path(self) -> str:
+        return os.path.join(self.output_dir, 'result.json')
+
+    def export_embeddings(self) -> int:
+        """
+        Stream every embedding from the live image collection into a memory-mapped matrix
+        Returns:
+            int: number of vectors written
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        state = self.migration_state.load()
+        collection = self.db_util.connect_collection(state['image_collection'])
+
+        # Normalise so that a dot product is the cosine similarity
+        records = self.db_util.export_collection(collection, self.embeddings_path, self.page_size,
+                                                 include=['metadatas'], normalize=True)
+        paths = [(metadata or {}).get('path', '') for metadata in records['metadatas']]
+        Utilities.write_json_atomic(self.records_path, {"ids": records['ids'], "paths": paths})
+        return len(records['ids'])
+
+    def find_groups(self) -> dict:
+        """
+        Compute duplicate groups and clusters from the exported matrix
+        Returns:
+            dict: duplicate groups and clusters, each a list of {ids, s3_links}
+        """
+        with open(self.records_path, 'r') as records_file:
+            records = json.load(records_file)
+        ids, paths = records['ids'], records['paths']
+        count = len(ids)
+
+        duplicates = np.arange(count)
+        clusters = np.arange(count)
+
+        if count > 1:
+            matrix = np.load(self.embeddings_path, mmap_mode='r')
+            neighbor_idx, neighbor_scores = self._nearest_neighbors(matrix, count)
+            a, b, scores, mutual = self._edges(neighbor_idx, neighbor_scores)
+
+            for left, right in zip(a[scores >= self.duplicate_threshold].tolist(),
+                                   b[scores >= self.duplicate_threshold].tolist()):
+                self._union(duplicates, left, right)
+
+            # Strongest links first, so a capped cluster keeps its closest members
+            sizes = np.ones(count, dtype=np.int64)
+            cluster_edges = mutual & (scores >= self.cluster_threshold)
+            for left, right in zip(a[cluster_edges].tolist(), b[cluster_edges].tolist()):
+                self._union(clusters, left, right, sizes, self.max_cluster_size)
+
+        return {
+            "total_images": count,
+            "duplicate_threshold": self.duplicate_threshold,
+            "cluster_threshold": self.cluster_threshold,
+            "neighbors": self.neighbors,
+            "max_cluster_size": self.max_cluster_size,
+            "duplicate_groups": self._collect_groups(duplicates, ids, paths),
+            "clusters": self._collect_groups(clusters, ids, paths)
+        }
+
+    def _nearest_neighbors(self, matrix: np.ndarray, count: int):
+        """
+        Find each row's top-k most similar rows, one block of rows at a time
+        Returns:
+            tuple: (count x k neighbour indices, count x k cosine similarities)
+        """
+        k = min(self.neighbors, count - 1)
+        neighbor_idx = np.empty((count, k), dtype=np.int64)
+        neighbor_scores = np.empty((count, k), dtype=np.float32)
+
+        for row_start in range(0, count, self.block_size):
+            row_end = min(row_start + self.block_size, count)
+            rows = np.asarray(matrix[row_start:row_end])
+            best_idx = np.empty((len(rows), 0), dtype=np.int64)
+            best_scores = np.empty((len(rows), 0), dtype=np.float32)
+
+            for col_start in range(0, count, self.block_size):
+                col_end = min(col_start + self.block_size, count)
+                cols = rows if col_start == row_start else np.asarray(matrix[col_start:col_end])
+                similarity = rows @ cols.T
+                if col_start == row_start:
+                    # An image is not its own neighbour
+                    np.fill_diagonal(similarity, -np.inf)
+
+                scores = np.concatenate([best_scores, similarity], axis=1)
+                idx = np.concatenate([best_idx, np.broadcast_to(np.arange(col_start, col_end), similarity.shape)],
+                                     axis=1)
+                if scores.shape[1] > k:
+                    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                    scores = np.take_along_axis(scores, top, axis=1)
+                    idx = np.take_along_axis(idx, top, axis=1)
+                best_scores, best_idx = scores, idx
+
+            neighbor_idx[row_start:row_end] = best_idx
+            neighbor_scores[row_start:row_end] = best_scores
+
+        return neighbor_idx, neighbor_scores
+
+    def _edges(self, neighbor_idx: np.ndarray, neighbor_scores: np.ndarray):
+        """
+        Turn the k-NN lists into unique pairs, sorted by descending similarity
+        Returns:
+            tuple: (left, right, score, mutual) arrays, one entry per pair
+        """
+        count, k = neighbor_idx.shape
+        sources = np.repeat(np.arange(count), k)
+        targets = neighbor_idx.ravel()
+        scores = neighbor_scores.ravel()
+
+        keep = scores >= min(self.cluster_threshold, self.duplicate_threshold)
+        left = np.minimum(sources[keep], targets[keep])
+        right = np.maximum(sources[keep], targets[keep])
+        scores = scores[keep]
+
+        # A pair listed from both ends is a mutual nearest neighbour
+        _, first, seen = np.unique(left * count + right, return_index=True, return_counts=True)
+        order = np.argsort(-scores[first], kind='stable')
+        first = first[order]
+        return left[first], right[first], scores[first], seen[order] == 2
+
+    def run(self) -> dict:
+        """Export the embeddings, find groups and store the result for the API"""
+        self.status = 'running'
+        started = time.time()
+        try:
+            self.export_embeddings()
+            result = self.find_groups()
+            result['generated_at'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+            result['duration_seconds'] = round(time.time() - started, 2)
+            Utilities.write_json_atomic(self.result_path, result)
+            self.status = 'idle'
+            self.last_error = None
+            return result
+        except Exception as e:
+            print(f"Error finding duplicates: {str(e)}")
+            self.status = 'failed'
+            self.last_error = {
+                "message": str(e),
+                "failed_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+            }
+            raise
+
+    def get_result(self, limit: int = 100, offset: int = 0) -> dict:
+        """
+        Return one page of the last stored result
+        Args:
+            limit: maximum number of duplicate groups and of clusters to return
+            offset: number of groups and clusters to skip
+        Returns:
+            dict: the page with totals, or None if no scan has finished yet
+        """
+        if limit < 1 or offset < 0:
+            raise ValueError(f"limit must be at least 1 and offset at least 0, got limit={limit}, offset={offset}")
+
+        result = self._load_result()
+        if result is None:
+            return None
+
+        page = {key: value for key, value in result.items() if key not in ('duplicate_groups', 'clusters')}
+        page.update({
+            "limit": limit,
+            "offset": offset,
+            "total_duplicate_groups": len(result['duplicate_groups']),
+            "total_clusters": len(result['clusters']),
+            "duplicate_groups": result['duplicate_groups'][offset:offset + limit],
+            "clusters": result['clusters'][offset:offset + limit]
+        })
+        return page
+
+    def _load_result(self) -> dict:
+        """Read the stored result, re-reading the file only when a new scan has written it"""
+        try:
+            modified = os.path.getmtime(self.result_path)
+        except FileNotFoundError:
+            return None
+
+        cached_modified, result = self._result_cache
+        if cached_modified != modified:
+            with open(self.result_path, 'r') as result_file:
+                result = json.load(result_file)
+            self._result_cache = (modified, result)
+        return result
+
+    def _union(self, parents: np.ndarray, a: int, b: int, sizes: np.ndarray = None, max_size: int = None) -> bool:
+        """Merge the sets holding a and b, unless that would exceed max_size; returns whether they merged"""
+        root_a, root_b = self._find(parents, a), self._find(parents, b)
+        if root_a == root_b:
+            return False
+        if sizes is not None:
+            if max_size and sizes[root_a] + sizes[root_b] > max_size:
+                return False
+            sizes[min(root_a, root_b)] += sizes[max(root_a, root_b)]
+        parents[max(root_a, root_b)] = min(root_a, root_b)
+        return True
+
+    def _find(self, parents: np.ndarray, node: int) -> int:
+        root = node
+        while parents[root] != root:
+            root = parents[root]
+        # Path compression
+        while parents[node] != root:
+            parents[node], node = root, parents[node]
+        return root
+
+    def _collect_groups(self, parents: np.ndarray, ids: list, paths: list) -> list:
+        groups = {}
+        for node in range(len(ids)):
+            groups.setdefault(self._find(parents, node), []).append(node)
+
+        result = [
+            {"ids": [ids[node] for node in members], "s3_links": [paths[node] for node in members]}
+            for members in groups.values() if len(members) > 1
+        ]
+        result.sort(key=lambda group: len(group['ids']), reverse=True)
+        return result
+
+if __name__ == "__main__":
+    finder = DuplicateFinder()
+    result = finder.run()
+    print(f"Found {len(result['duplicate_groups'])} duplicate groups and {len(result['clusters'])} clusters "
+          f"across {result['total_images']} images in {result['duration_seconds']}s")
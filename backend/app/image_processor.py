@@ -4,24 +4,64 @@ import requests
 from io import BytesIO
 from aws_utilities import S3Utilities
 from database_util import DatabaseUtilities
+from migration_state import MigrationState
 from util import Utilities
 import torch
 from transformers import CLIPProcessor, CLIPModel, BlipProcessor, BlipForConditionalGeneration
 
 
 class ImageProcessor:
-    def __init__(self):
-        # Load the CLIP model from Hugging Face
-        self.model = CLIPModel.from_pretrained('openai/clip-vit-base-patch32')
-        # Load the processor used to pre-process the images and make them compatible with the model
-        self.processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
-        self.blip_processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base")
-        self.blip_model = BlipForConditionalGeneration.from_pretrained("Salesforce/blip-image-captioning-base")
+    def __init__(self, clip_model_name: str = None, blip_model_name: str = None,
+                 image_collection_name: str = None, text_collection_name: str = None):
+        # Models and collections default to whatever is live in the migration state
+        self.migration_state = MigrationState()
+        state = self.migration_state.load()
+        self._load_models(clip_model_name or state['clip_model'], blip_model_name or state['blip_model'])
         self.db_util = DatabaseUtilities("image_search")
-        self.collection = self.db_util.connect_image_search_collection()
         # Create separate collections for image and text embeddings
-        self.image_collection = self.db_util.connect_collection("image_collection")
-        self.text_collection = self.db_util.connect_collection("text_collection")
+        self._connect_collections(image_collection_name or state['image_collection'],
+                                  text_collection_name or state['text_collection'])
+        # Processor for the new models, loaded lazily while a migration is running
+        self._target_processor = None
+
+    def _load_models(self, clip_model_name: str, blip_model_name: str):
+        # Load the CLIP model from Hugging Face
+        self.clip_model_name = clip_model_name
+        self.model = CLIPModel.from_pretrained(clip_model_name)
+        # Load the processor used to pre-process the images and make them compatible with the model
+        self.processor = CLIPProcessor.from_pretrained(clip_model_name)
+        self.blip_model_name = blip_model_name
+        self.blip_processor = BlipProcessor.from_pretrained(blip_model_name)
+        self.blip_model = BlipForConditionalGeneration.from_pretrained(blip_model_name)
+
+    def _connect_collections(self, image_collection_name: str, text_collection_name: str):
+        self.image_collection_name = image_collection_name
+        self.text_collection_name = text_collection_name
+        self.image_collection = self.db_util.connect_collection(image_collection_name)
+        self.text_collection = self.db_util.connect_collection(text_collection_name)
+
+    def sync_with_migration_state(self) -> dict:
+        """
+        Pick up a switch-over performed by the reindex job
+        Returns:
+            dict: the current migration state
+        """
+        state = self.migration_state.load()
+        if state['image_collection'] == self.image_collection_name:
+            return state
+
+        target = self._target_processor
+        if target and target.image_collection_name == state['image_collection']:
+            # Reuse the models already loaded for dual writes
+            self.clip_model_name, self.model, self.processor = target.clip_model_name, target.model, target.processor
+            self.blip_model_name, self.blip_model, self.blip_processor = \
+                target.blip_model_name, target.blip_model, target.blip_processor
+        elif (state['clip_model'], state['blip_model']) != (self.clip_model_name, self.blip_model_name):
+            self._load_models(state['clip_model'], state['blip_model'])
+
+        self._connect_collections(state['image_collection'], state['text_collection'])
+        self._target_processor = None
+        return state
 
     async def process_image_url(self, url: str) -> str:
         """
@@ -33,6 +73,9 @@ class ImageProcessor:
             response = requests.get(url)
             image = Image.open(BytesIO(response.content))
             
+            # Make sure we write to the live collections after a switch-over
+            self.sync_with_migration_state()
+            
             # Process image (resize, normalize, etc.)
             #processed_image = self._preprocess_image(image)
             
@@ -64,6 +107,20 @@ class ImageProcessor:
         except Exception as e:
             print(f"Error details: {str(e)}")
             raise Exception(f"Failed to generate description: {str(e)}")
+
+    def generate_descriptions(self, images: list) -> list:
+        """Generate BLIP descriptions for a batch of images in one forward pass"""
+        try:
+            images = [image if image.mode == 'RGB' else image.convert('RGB') for image in images]
+            inputs = self.blip_processor(images, return_tensors="pt")
+
+            with torch.no_grad():
+                output = self.blip_model.generate(**inputs, max_new_tokens=50)
+
+            return self.blip_processor.batch_decode(output, skip_special_tokens=True)
+
+        except Exception as e:
+            raise Exception(f"Failed to generate descriptions: {str(e)}")
         
         
     def extract_image_features(self, image: Image) -> torch.Tensor:
@@ -105,6 +162,20 @@ class ImageProcessor:
 
         return image_embeddings, text_embeddings
 
+    def _preprocess_batch(self, images: list, texts: list):
+        """Embed a batch of images and a batch of texts, one list per input"""
+        images = [image if image.mode == 'RGB' else image.convert('RGB') for image in images]
+        image_inputs = self.processor(images=images, return_tensors="pt", padding=True)
+        text_inputs = self.processor(text=texts, return_tensors="pt", padding=True, truncation=True)
+
+        with torch.no_grad():
+            image_features = self.model.get_image_features(**image_inputs)
+            image_features = image_features / image_features.norm(dim=-1, keepdim=True)
+            text_features = self.model.get_text_features(**text_inputs)
+            text_features = text_features / text_features.norm(dim=-1, keepdim=True)
+
+        return image_features.tolist(), text_features.tolist()
+
     def _store_image(self, image: Image, url: str, description: str) -> str:
         """Store image and its metadata in separate collections"""
         try:
@@ -152,9 +223,64 @@ class ImageProcessor:
                     documents=[description]
                 )
             
+            state = self.migration_state.load()
+            if state['image_collection'] != self.image_collection_name:
+                # The reindex job switched over while this ingest was running, so the
+                # collections just written are no longer live. The image has to reach
+                # the new live collections, otherwise the ingest has failed.
+                self._write_to_target(state, image, image_id, metadata, url)
+            elif state.get('migration'):
+                # Keep the migration target up to date while a reindex is running.
+                # The live write has succeeded, so a failure here is left for the
+                # reindex job to reconcile rather than failing the ingest.
+                try:
+                    self._write_to_target(state['migration'], image, image_id, metadata, url)
+                except Exception as e:
+                    print(f"Dual write of {image_id} failed, leaving it for reindex: {str(e)}")
+            
             return image_id
         except Exception as e:
             raise Exception(f"Error storing image: {str(e)}")
+
+    def _get_target_processor(self, migration: dict):
+        """
+        Load (once) a processor for another set of models and collections
+        Args:
+            migration: a migration entry or migration state, naming the models and collections
+        """
+        target = self._target_processor
+        if target is None or target.image_collection_name != migration['image_collection']:
+            target = ImageProcessor(
+                clip_model_name=migration['clip_model'],
+                blip_model_name=migration['blip_model'],
+                image_collection_name=migration['image_collection'],
+                text_collection_name=migration['text_collection']
+            )
+            self._target_processor = target
+        return target
+
+    def _write_to_target(self, migration: dict, image: Image, image_id: str, metadata: dict, url: str):
+        """Write an ingest into the collections named by migration, embedded with its models"""
+        if migration['image_collection'] == self.image_collection_name:
+            return
+
+        target = self._get_target_processor(migration)
+        description = metadata['description']
+        if target.blip_model_name != self.blip_model_name:
+            description = target.generate_description(image)
+
+        image_embeddings, text_embeddings = target._preprocess_image(image, description)
+        target.image_collection.upsert(
+            ids=[image_id],
+            metadatas=[{**metadata, "description": description}],
+            embeddings=[image_embeddings],
+            documents=[url]
+        )
+        target.text_collection.upsert(
+            ids=[image_id],
+            embeddings=[text_embeddings],
+            documents=[description]
+        )
         
     
   
@@ -174,7 +300,7 @@ if __name__ == "__main__":
             print(f"Successfully processed image. Image ID: {image_id}")
             
             # Verify the image was stored by retrieving its metadata
-            results = processor.collection.get(
+            results = processor.image_collection.get(
                 ids=[image_id],
                 include=["metadatas"]
             )
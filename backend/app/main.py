@@ -1,8 +1,9 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, UploadFile, File, BackgroundTasks, Query
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Optional
 from image_processor import ImageProcessor
 from search_engine import SearchEngine
+from duplicate_finder import DuplicateFinder
 import uvicorn
 
 app = FastAPI(title="ImageSearch API")
@@ -18,6 +19,7 @@ app.add_middleware(
 
 image_processor = ImageProcessor()
 search_engine = SearchEngine()
+duplicate_finder = DuplicateFinder()
 
 @app.post("/images/add")
 async def add_image(image_url: str):
@@ -62,9 +64,28 @@ async def get_all_images():
 @app.delete("/images/delete")
 async def delete_image(image_id: str):
     """Delete an image from the index"""
-    await search_engine.delete_image(image_id)
-    return {"status": "success"}
+    return await search_engine.delete_image(image_id)
 
+@app.post("/images/duplicates/scan")
+async def scan_duplicates(background_tasks: BackgroundTasks):
+    """Start a background scan for duplicate and near-duplicate images"""
+    if duplicate_finder.status == 'running':
+        return {"status": "running"}
+    duplicate_finder.status = 'running'
+    background_tasks.add_task(duplicate_finder.run)
+    return {"status": "started"}
+
+@app.get("/images/duplicates")
+async def get_duplicates(limit: int = Query(100, ge=1, le=1000), offset: int = Query(0, ge=0)):
+    """Return a page of duplicate groups and clusters from the last finished scan"""
+    try:
+        scan = {"scan_status": duplicate_finder.status, "last_error": duplicate_finder.last_error}
+        result = duplicate_finder.get_result(limit, offset)
+        if result is None:
+            return {"status": "error", "message": "No duplicate scan has finished yet", **scan}
+        return {"status": "success", **scan, **result}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
 
 
 if __name__ == "__main__":
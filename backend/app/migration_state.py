@@ -0,0 +1,126 @@
+import json
+from util import Utilities
+
+DEFAULT_CLIP_MODEL = "openai/clip-vit-base-patch32"
+DEFAULT_BLIP_MODEL = "Salesforce/blip-image-captioning-base"
+
+
+class MigrationState:
+    """
+    Tracks which collections and models are live, and any in-flight reindex.
+
+    The state lives in a small JSON file that is rewritten atomically, so the
+    ingest path, the search path and the reindex job always see either the
+    old layout or the new one, never a mix of both.
+    """
+
+    def __init__(self, path: str = None):
+        Utilities.Load_Env()
+        self.path = path or Utilities.get_env_variable('MIGRATION_STATE_PATH', 'migration_state.json')
+
+    def default_state(self) -> dict:
+        return {
+            "version": 1,
+            "clip_model": DEFAULT_CLIP_MODEL,
+            "blip_model": DEFAULT_BLIP_MODEL,
+            "image_collection": "image_collection",
+            "text_collection": "text_collection",
+            "migration": None
+        }
+
+    def load(self) -> dict:
+        """Read the current state, falling back to the defaults if no file exists yet"""
+        try:
+            with open(self.path, 'r') as state_file:
+                state = json.load(state_file)
+        except FileNotFoundError:
+            return self.default_state()
+        except Exception as e:
+            raise Exception(f"Error reading migration state {self.path}: {str(e)}")
+
+        return {**self.default_state(), **state}
+
+    def save(self, state: dict):
+        """Write the state to a temporary file and rename it over the old one"""
+        try:
+            Utilities.write_json_atomic(self.path, state, indent=2)
+        except Exception as e:
+            raise Exception(f"Error writing migration state {self.path}: {str(e)}")
+
+    def start(self, clip_model: str, blip_model: str, version: int = None) -> dict:
+        """
+        Begin a migration to a new versioned pair of collections
+        Returns:
+            dict: the migration entry, or the existing one if it targets the same models
+        """
+        state = self.load()
+        migration = state.get('migration')
+        if migration:
+            if migration['clip_model'] == clip_model and migration['blip_model'] == blip_model:
+                return migration
+            raise Exception(f"Migration to version {migration['version']} is already in progress")
+
+        version = version or state['version'] + 1
+        if version <= state['version']:
+            raise Exception(f"Target version {version} must be newer than live version {state['version']}")
+
+        migration = {
+            "version": version,
+            "clip_model": clip_model,
+            "blip_model": blip_model,
+            "image_collection": f"image_collection_v{version}",
+            "text_collection": f"text_collection_v{version}",
+            "offset": 0,
+            "processed": 0
+        }
+        state['migration'] = migration
+        self.save(state)
+        return migration
+
+    def update_checkpoint(self, offset: int, processed: int):
+        """Record how far the reindex job has got through the live collection"""
+        state = self.load()
+        if not state.get('migration'):
+            raise Exception("No migration in progress")
+        state['migration']['offset'] = offset
+        state['migration']['processed'] = processed
+        self.save(state)
+
+    def switch_over(self) -> dict:
+        """Make the migration target the live collections and models in a single write"""
+        state = self.load()
+        migration = state.get('migration')
+        if not migration:
+            raise Exception("No migration in progress")
+
+        new_state = {
+            "version": migration['version'],
+            "clip_model": migration['clip_model'],
+            "blip_model": migration['blip_model'],
+            "image_collection": migration['image_collection'],
+            "text_collection": migration['text_collection'],
+            "previous": {
+                "version": state['version'],
+                "image_collection": state['image_collection'],
+                "text_collection": state['text_collection']
+            },
+            "migration": None
+        }
+        self.save(new_state)
+        return new_state
+
+    def mark_snapshot_imported(self, snapshot_id: str, image_collection: str, text_collection: str):
+        """Record that a snapshot has been fully loaded into the given collections"""
+        state = self.load()
+        state['snapshot_import'] = {
+            "snapshot_id": snapshot_id,
+            "image_collection": image_collection,
+            "text_collection": text_collection
+        }
+        self.save(state)
+
+    def abort(self):
+        """Drop the in-flight migration; the live collections are left untouched"""
+        state = self.load()
+        state['migration'] = None
+        self.save(state)
@@ -0,0 +1,249 @@
+import argparse
+from io import BytesIO
+from PIL import Image
+from aws_utilities import S3Utilities
+from database_util import DatabaseUtilities
+from image_processor import ImageProcessor
+from migration_state import MigrationState
+
+
+class ReindexJob:
+    """
+    Re-embed every stored image with new CLIP/BLIP models into a versioned
+    pair of collections, then switch the live index over to them.
+
+    Records are streamed page by page from the live image collection and the
+    originals are fetched from S3, so nothing has to be re-crawled. Progress is
+    checkpointed after every page, and re-running the job resumes from the last
+    checkpoint. While the job runs, new ingests are dual-written to the target
+    collections by ImageProcessor. The job refuses to switch over while any
+    live record is missing from the target, unless allow_missing is set.
+    """
+
+    def __init__(self, clip_model_name: str, blip_model_name: str, version: int = None,
+                 batch_size: int = 32, page_size: int = 256, allow_missing: bool = False):
+        self.clip_model_name = clip_model_name
+        self.blip_model_name = blip_model_name
+        self.version = version
+        self.batch_size = batch_size
+        self.page_size = page_size
+        self.allow_missing = allow_missing
+        # Errors for records that could not be re-embedded, by image id
+        self.failed = {}
+        self.migration_state = MigrationState()
+        self.db_util = DatabaseUtilities()
+        self.s3_util = S3Utilities()
+
+    def run(self) -> dict:
+        """
+        Run (or resume) the migration and switch over once it is complete
+        Returns:
+            dict: the new live migration state
+        """
+        state = self.migration_state.load()
+        migration = self.migration_state.start(self.clip_model_name, self.blip_model_name, self.version)
+
+        self.source_collection = self.db_util.connect_collection(state['image_collection'])
+        self.target = ImageProcessor(
+            clip_model_name=migration['clip_model'],
+            blip_model_name=migration['blip_model'],
+            image_collection_name=migration['image_collection'],
+            text_collection_name=migration['text_collection']
+        )
+        # Captions only need regenerating when the captioner itself changes
+        self.recaption = migration['blip_model'] != state['blip_model']
+
+        offset = migration['offset']
+        processed = migration['processed']
+        print(f"Reindexing {state['image_collection']} into {migration['image_collection']} from offset {offset}")
+
+        while True:
+            page = self.source_collection.get(
+                limit=self.page_size,
+                offset=offset,
+                include=['metadatas', 'documents']
+            )
+            ids = page['ids']
+            if not ids:
+                break
+
+            for start in range(0, len(ids), self.batch_size):
+                end = start + self.batch_size
+                processed += self._reindex_batch(ids[start:end], page['metadatas'][start:end],
+                                                 page['documents'][start:end])
+
+            offset += len(ids)
+            self.migration_state.update_checkpoint(offset, processed)
+            print(f"Reindexed {processed} images (offset {offset})")
+
+        processed += self._reconcile()
+
+        live_ids = self._live_ids()
+        missing = self._missing_ids(live_ids)
+        if missing:
+            for image_id in missing:
+                print(f"Missing from {migration['image_collection']}: {image_id} "
+                      f"({self.failed.get(image_id, 'not reindexed')})")
+            if not self.allow_missing:
+                raise Exception(f"{len(missing)} images are missing from {migration['image_collection']}, "
+                                f"not switching over: {', '.join(missing)}")
+            print(f"Switching over without {len(missing)} images")
+
+        new_state = self.migration_state.switch_over()
+        processed += self._catch_up(set(live_ids))
+        print(f"Switched over to {new_state['image_collection']} after reindexing {processed} images")
+        return new_state
+
+    def _load_image(self, metadata: dict) -> Image:
+        """Fetch the stored original of an image from S3"""
+        key = self.s3_util.key_from_url(metadata['path'])
+        image = Image.open(BytesIO(self.s3_util.download_from_s3(key)))
+        image.load()
+        return image
+
+    def _reindex_batch(self, ids: list, metadatas: list, documents: list) -> int:
+        """Re-embed one batch of records into the target collections"""
+        batch_ids, batch_images, batch_metadatas, batch_documents = [], [], [], []
+        for image_id, metadata, document in zip(ids, metadatas, documents):
+            try:
+                batch_images.append(self._load_image(metadata))
+            except Exception as e:
+                print(f"Skipping image {image_id}: {str(e)}")
+                self.failed[image_id] = str(e)
+                continue
+            self.failed.pop(image_id, None)
+            batch_ids.append(image_id)
+            batch_metadatas.append(metadata)
+            batch_documents.append(document)
+
+        if not batch_ids:
+            return 0
+
+        if self.recaption:
+            descriptions = self.target.generate_descriptions(batch_images)
+        else:
+            descriptions = [metadata.get('description', '') for metadata in batch_metadatas]
+
+        image_embeddings, text_embeddings = self.target._preprocess_batch(batch_images, descriptions)
+
+        self.target.image_collection.upsert(
+            ids=batch_ids,
+            metadatas=[{**metadata, "description": description}
+                       for metadata, description in zip(batch_metadatas, descriptions)],
+            embeddings=image_embeddings,
+            documents=batch_documents
+        )
+        self.target.text_collection.upsert(
+            ids=batch_ids,
+            embeddings=text_embeddings,
+            documents=descriptions
+        )
+        return len(batch_ids)
+
+    def _reconcile(self) -> int:
+        """
+        Make the target hold exactly the live ids before switching over.
+        Deletes during the migration shift offsets, so a record can be skipped
+        by the paged pass; those are re-embedded here. A delete can also land
+        between reading a page and upserting it, bringing the image back into
+        the target; ids that are no longer live are removed from the target.
+        """
+        self._remove_stale()
+        processed = 0
+        offset = 0
+        while True:
+            page = self.source_collection.get(limit=self.page_size, offset=offset, include=[])
+            ids = page['ids']
+            if not ids:
+                break
+            offset += len(ids)
+
+            present = set(self.target.image_collection.get(ids=ids, include=[])['ids'])
+            missing = [image_id for image_id in ids if image_id not in present]
+            if not missing:
+                continue
+
+            records = self.source_collection.get(ids=missing, include=['metadatas', 'documents'])
+            for start in range(0, len(records['ids']), self.batch_size):
+                end = start + self.batch_size
+                processed += self._reindex_batch(records['ids'][start:end], records['metadatas'][start:end],
+                                                 records['documents'][start:end])
+        return processed
+
+    def _remove_stale(self):
+        """Delete target records whose id is no longer in the live collection"""
+        stale = []
+        offset = 0
+        while True:
+            ids = self.target.image_collection.get(limit=self.page_size, offset=offset, include=[])['ids']
+            if not ids:
+                break
+            offset += len(ids)
+            present = set(self.source_collection.get(ids=ids, include=[])['ids'])
+            stale.extend(image_id for image_id in ids if image_id not in present)
+
+        # Delete after paging so the offsets above stay valid
+        for start in range(0, len(stale), self.page_size):
+            batch = stale[start:start + self.page_size]
+            self.target.image_collection.delete(ids=batch)
+            self.target.text_collection.delete(ids=batch)
+        if stale:
+            print(f"Removed {len(stale)} deleted images from {self.target.image_collection_name}")
+
+    def _catch_up(self, checked_ids: set) -> int:
+        """
+        Re-embed images ingested into the old collections after the final check.
+        An ingest that finished between that check and the switch-over may have
+        failed its dual write, leaving it only in the old collections.
+        """
+        new_ids = [image_id for image_id in self._live_ids() if image_id not in checked_ids]
+        missing = self._missing_ids(new_ids)
+        if not missing:
+            return 0
+
+        records = self.source_collection.get(ids=missing, include=['metadatas', 'documents'])
+        processed = 0
+        for start in range(0, len(records['ids']), self.batch_size):
+            end = start + self.batch_size
+            processed += self._reindex_batch(records['ids'][start:end], records['metadatas'][start:end],
+                                             records['documents'][start:end])
+
+        for image_id in self._missing_ids(missing):
+            print(f"Missing from {self.target.image_collection_name} after switch-over: {image_id} "
+                  f"({self.failed.get(image_id, 'not reindexed')})")
+        return processed
+
+    def _live_ids(self) -> list:
+        """All ids in the old live collection, read in one call so deletes cannot shift pages"""
+        return self.source_collection.get(include=[])['ids']
+
+    def _missing_ids(self, ids: list) -> list:
+        """The given ids that are not in the target"""
+        missing = []
+        for start in range(0, len(ids), self.page_size):
+            batch = ids[start:start + self.page_size]
+            present = set(self.target.image_collection.get(ids=batch, include=[])['ids'])
+            missing.extend(image_id for image_id in batch if image_id not in present)
+        return missing
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-embed the image index with new models")
+    parser.add_argument("--clip-model", help="Hugging Face name of the CLIP model to migrate to")
+    parser.add_argument("--blip-model", help="Hugging Face name of the BLIP captioner to migrate to")
+    parser.add_argument("--version", type=int, default=None, help="Target collection version (default: live + 1)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--page-size", type=int, default=256)
+    parser.add_argument("--allow-missing", action="store_true",
+                        help="Switch over even if some images could not be re-embedded")
+    parser.add_argument("--abort", action="store_true", help="Abandon the in-flight migration")
+    args = parser.parse_args()
+
+    if args.abort:
+        MigrationState().abort()
+    elif not args.clip_model or not args.blip_model:
+        parser.error("--clip-model and --blip-model are required")
+    else:
+        job = ReindexJob(args.clip_model, args.blip_model, args.version, args.batch_size, args.page_size,
+                         args.allow_missing)
+        job.run()
@@ -5,6 +5,9 @@ from io import BytesIO
 from database_util import DatabaseUtilities
 from image_processor import ImageProcessor
 from aws_utilities import S3Utilities
+from migration_state import MigrationState
+from snapshot import SnapshotCollection, load_manifest
+from util import Utilities
 import requests
 
 class SearchEngine:
@@ -12,13 +15,64 @@ class SearchEngine:
         # Initialize database connection
         self.db_util = DatabaseUtilities()
         self.s3_util = S3Utilities()
+        self.migration_state = MigrationState()
+        # Optional snapshot to serve searches from while Chroma is still empty
+        self.snapshot_dir = Utilities.get_env_variable('SNAPSHOT_DIR')
         # Initialize collections
-        self.image_collection = self.db_util.connect_collection("image_collection")
-        self.text_collection = self.db_util.connect_collection("text_collection")
+        self.image_collection_name = None
+        self.snapshot_id = None
+        self.serving_snapshot = False
+        self._sync_collections()
+
+    def _sync_collections(self) -> dict:
+        """Reconnect to the live collections if the reindex job has switched over"""
+        state = self.migration_state.load()
+        if state['image_collection'] != self.image_collection_name:
+            self.image_collection_name = state['image_collection']
+            self.db_image_collection = self.db_util.connect_collection(state['image_collection'])
+            self.db_text_collection = self.db_util.connect_collection(state['text_collection'])
+            self.image_collection = self.db_image_collection
+            self.text_collection = self.db_text_collection
+            self.serving_snapshot = False
+            self._warm_start(state)
+        elif self.serving_snapshot and self._snapshot_imported(state):
+            # Both collections are loaded, stop serving from the file
+            print("Snapshot import complete, switching searches to the database")
+            self.image_collection = self.db_image_collection
+            self.text_collection = self.db_text_collection
+            self.serving_snapshot = False
+        return state
+
+    def _warm_start(self, state: dict):
+        """Serve searches from the snapshot if the live collections are still empty"""
+        if not self.snapshot_dir or self.db_image_collection.count() > 0:
+            return
+        try:
+            manifest = load_manifest(self.snapshot_dir)
+            if manifest['clip_model'] != state['clip_model']:
+                print(f"Ignoring snapshot built with {manifest['clip_model']}, live model is {state['clip_model']}")
+                return
+            self.snapshot_id = manifest['snapshot_id']
+            if self._snapshot_imported(state):
+                return
+            self.image_collection = SnapshotCollection(self.snapshot_dir, 'image')
+            self.text_collection = SnapshotCollection(self.snapshot_dir, 'text')
+            self.serving_snapshot = True
+            print(f"Serving searches from snapshot {self.snapshot_dir}")
+        except Exception as e:
+            print(f"Error loading snapshot: {str(e)}")
+
+    def _snapshot_imported(self, state: dict) -> bool:
+        """Whether the warm-start snapshot has been fully imported into the live collections"""
+        marker = state.get('snapshot_import') or {}
+        return marker.get('snapshot_id') == self.snapshot_id and \
+            marker.get('image_collection') == self.image_collection_name
 
     async def get_all_images(self):
         """Retrieve all images from the collection"""
         try:
+            self._sync_collections()
+            
             # Use image collection as primary source
             collection = self.image_collection
             
@@ -55,6 +109,8 @@ class SearchEngine:
     async def text_search(self, query: str) -> Dict:
         """Search images using natural language text"""
         try:
+            self._sync_collections()
+            
             # Get text embeddings
             image_processor = ImageProcessor()
             _, text_embeddings = image_processor._preprocess_image(None, query)
@@ -109,6 +165,8 @@ class SearchEngine:
     async def url_search(self, image_url: str) -> Dict:
         """Search for similar images using an image URL"""
         try:
+            self._sync_collections()
+            
             # Download and process the image from URL
             image_processor = ImageProcessor()
             response = requests.get(image_url)
@@ -160,6 +218,12 @@ class SearchEngine:
     async def delete_image(self, image_id: str) -> Dict:
         """Delete an image from both collections and S3"""
         try:
+            state = self._sync_collections()
+            if self.serving_snapshot:
+                # The snapshot is read-only and would bring the image back on import
+                raise Exception("Images cannot be deleted while searches are served from a snapshot; "
+                                "retry once the snapshot import has finished")
+            
             # Get the image metadata from image collection
             results = self.image_collection.get(
                 ids=[image_id],
@@ -181,8 +245,14 @@ class SearchEngine:
             )
             
             # Delete from both collections
-            self.image_collection.delete(ids=[image_id])
-            self.text_collection.delete(ids=[image_id])
+            self.db_image_collection.delete(ids=[image_id])
+            self.db_text_collection.delete(ids=[image_id])
+            
+            # Also remove it from the target of a running migration
+            migration = state.get('migration')
+            if migration:
+                self.db_util.connect_collection(migration['image_collection']).delete(ids=[image_id])
+                self.db_util.connect_collection(migration['text_collection']).delete(ids=[image_id])
             
             return {
                 'status': 'success',
@@ -0,0 +1,225 @@
+import argparse
+import json
+import os
+import numpy as np
+from database_util import DatabaseUtilities
+from migration_state import MigrationState
+from util import Utilities
+
+# Snapshot sub-directories, keyed by role so a snapshot can be imported into
+# whatever versioned collections are live on the receiving node
+SNAPSHOT_ROLES = {"image": "image_collection", "text": "text_collection"}
+
+
+class SnapshotManager:
+    """
+    Export and import the image and text collections as snapshots.
+
+    A snapshot directory holds a manifest plus, per collection, the embeddings
+    as a .npy matrix (memory-mapped on read) and the ids, documents and
+    metadata as a columnar JSON file (one list per field). Importing replays
+    the snapshot into Chroma with chunked adds, so a cold node can be seeded
+    without re-running BLIP and CLIP. Once both collections are loaded the
+    import is recorded in the migration state, which tells a warm-started
+    SearchEngine to move to Chroma.
+    """
+
+    def __init__(self, snapshot_dir: str, page_size: int = 1000, chunk_size: int = 5000):
+        self.snapshot_dir = snapshot_dir
+        self.page_size = page_size
+        self.chunk_size = chunk_size
+        self.migration_state = MigrationState()
+        self.db_util = DatabaseUtilities()
+
+    def export(self) -> dict:
+        """
+        Write both live collections to the snapshot directory
+        Returns:
+            dict: the snapshot manifest
+        """
+        state = self.migration_state.load()
+        manifest = {
+            "snapshot_id": Utilities.generate_uuid(),
+            "version": state['version'],
+            "clip_model": state['clip_model'],
+            "blip_model": state['blip_model'],
+            "collections": {}
+        }
+        for role, state_key in SNAPSHOT_ROLES.items():
+            collection = self.db_util.connect_collection(state[state_key])
+            manifest['collections'][role] = self._export_collection(collection, os.path.join(self.snapshot_dir, role))
+
+        Utilities.write_json_atomic(os.path.join(self.snapshot_dir, 'manifest.json'), manifest)
+        return manifest
+
+    def _export_collection(self, collection, output_dir: str) -> dict:
+        os.makedirs(output_dir, exist_ok=True)
+        embeddings_path = os.path.join(output_dir, 'embeddings.npy')
+
+        records = self.db_util.export_collection(collection, embeddings_path, self.page_size,
+                                                 include=['metadatas', 'documents'])
+        ids, documents, metadatas = records['ids'], records['documents'], records['metadatas']
+        dimension = np.load(embeddings_path, mmap_mode='r').shape[1]
+
+        # Store metadata column by column; rows without a key get None
+        keys = sorted({key for metadata in metadatas if metadata for key in metadata})
+        columns = {key: [(metadata or {}).get(key) for metadata in metadatas] for key in keys}
+        Utilities.write_json_atomic(os.path.join(output_dir, 'records.json'), {
+            "ids": ids,
+            "documents": documents,
+            "metadatas": columns
+        })
+        return {"count": len(ids), "dimension": dimension}
+
+    def import_snapshot(self, force: bool = False) -> dict:
+        """
+        Bulk-load the snapshot into the live collections
+        Args:
+            force: import even if the snapshot was built with different models
+        Returns:
+            dict: number of records added per collection
+        """
+        manifest = load_manifest(self.snapshot_dir)
+        state = self.migration_state.load()
+        if not force and (manifest['clip_model'], manifest['blip_model']) != (state['clip_model'], state['blip_model']):
+            raise Exception(f"Snapshot was built with {manifest['clip_model']} / {manifest['blip_model']}, "
+                            f"but the live index uses {state['clip_model']} / {state['blip_model']}")
+
+        added = {}
+        for role, state_key in SNAPSHOT_ROLES.items():
+            collection = self.db_util.connect_collection(state[state_key])
+            added[role] = self._import_collection(collection, os.path.join(self.snapshot_dir, role))
+            print(f"Imported {added[role]} records into {state[state_key]}")
+
+        # Only now may searches warm-started from this snapshot move to the database
+        self.migration_state.mark_snapshot_imported(manifest['snapshot_id'], state['image_collection'],
+                                                    state['text_collection'])
+        return added
+
+    def _import_collection(self, collection, input_dir: str) -> int:
+        embeddings, records = load_records(input_dir)
+        ids = records['ids']
+        for start in range(0, len(ids), self.chunk_size):
+            end = min(start + self.chunk_size, len(ids))
+            batch = {
+                "ids": ids[start:end],
+                "embeddings": np.asarray(embeddings[start:end]).tolist(),
+                "documents": records['documents'][start:end]
+            }
+            metadatas = [row_metadata(records, index) for index in range(start, end)]
+            if any(metadatas):
+                batch['metadatas'] = metadatas
+            collection.add(**batch)
+        return len(ids)
+
+
+class SnapshotCollection:
+    """
+    Read-only, Chroma-like view over one collection of a snapshot.
+
+    Supports the count/get/query calls used by SearchEngine so a cold node can
+    serve searches straight from the memory-mapped file while Chroma is still
+    being populated. Distances are squared L2, matching Chroma's default space.
+    """
+
+    def __init__(self, snapshot_dir: str, role: str, block_size: int = 65536):
+        self.embeddings, self.records = load_records(os.path.join(snapshot_dir, role))
+        self.ids = self.records['ids']
+        self.positions = {image_id: index for index, image_id in enumerate(self.ids)}
+        self.block_size = block_size
+        self.squared_norms = np.concatenate([
+            np.einsum('ij,ij->i', block, block)
+            for block in (self._block(start) for start in range(0, len(self.ids), block_size))
+        ]) if self.ids else np.zeros(0, dtype=np.float32)
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def get(self, ids: list = None, include: list = None, **kwargs) -> dict:
+        include = ['metadatas', 'documents'] if include is None else include
+        indices = [self.positions[image_id] for image_id in ids if image_id in self.positions] \
+            if ids is not None else list(range(len(self.ids)))
+        return self._rows(indices, include)
+
+    def query(self, query_embeddings: list, n_results: int = 10, include: list = None, **kwargs) -> dict:
+        include = ['metadatas', 'documents', 'distances'] if include is None else include
+        result = {"ids": []}
+        for key in include:
+            result[key] = []
+
+        for embedding in query_embeddings:
+            query = np.asarray(embedding, dtype=np.float32)
+            best_indices = np.zeros(0, dtype=np.int64)
+            best_distances = np.zeros(0, dtype=np.float32)
+
+            # Keep a running top-k so only one block is in memory at a time
+            for start in range(0, len(self.ids), self.block_size):
+                block = self._block(start)
+                distances = self.squared_norms[start:start + len(block)] - 2 * (block @ query) + query @ query
+                candidates = np.concatenate([best_distances, distances])
+                indices = np.concatenate([best_indices, np.arange(start, start + len(block))])
+                keep = np.argsort(candidates)[:n_results]
+                best_distances, best_indices = candidates[keep], indices[keep]
+
+            rows = self._rows(best_indices.tolist(), include)
+            result['ids'].append(rows['ids'])
+            for key in include:
+                result[key].append(best_distances.tolist() if key == 'distances' else rows[key])
+        return result
+
+    def delete(self, **kwargs):
+        raise Exception("Snapshot collections are read-only")
+
+    def _block(self, start: int) -> np.ndarray:
+        """Load one block of rows, never reading past the last id"""
+        return np.asarray(self.embeddings[start:min(start + self.block_size, len(self.ids))])
+
+    def _rows(self, indices: list, include: list) -> dict:
+        rows = {"ids": [self.ids[index] for index in indices]}
+        if 'metadatas' in include:
+            rows['metadatas'] = [row_metadata(self.records, index) for index in indices]
+        if 'documents' in include:
+            rows['documents'] = [self.records['documents'][index] for index in indices]
+        if 'embeddings' in include:
+            rows['embeddings'] = [self.embeddings[index].tolist() for index in indices]
+        return rows
+
+
+def load_manifest(snapshot_dir: str) -> dict:
+    try:
+        with open(os.path.join(snapshot_dir, 'manifest.json'), 'r') as manifest_file:
+            return json.load(manifest_file)
+    except Exception as e:
+        raise Exception(f"Error reading snapshot {snapshot_dir}: {str(e)}")
+
+
+def load_records(input_dir: str):
+    """Memory-map a collection's embeddings and read its columnar records"""
+    embeddings = np.load(os.path.join(input_dir, 'embeddings.npy'), mmap_mode='r')
+    with open(os.path.join(input_dir, 'records.json'), 'r') as records_file:
+        records = json.load(records_file)
+    return embeddings, records
+
+
+def row_metadata(records: dict, index: int) -> dict:
+    """Rebuild one row's metadata dict from the columnar records"""
+    metadata = {}
+    for key, column in records['metadatas'].items():
+        if column[index] is not None:
+            metadata[key] = column[index]
+    return metadata or None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export or import a snapshot of the image and text collections")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("snapshot_dir")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Records per Chroma add when importing")
+    parser.add_argument("--force", action="store_true", help="Import even if the models do not match")
+    args = parser.parse_args()
+
+    manager = SnapshotManager(args.snapshot_dir, chunk_size=args.chunk_size)
+    if args.action == "export":
+        manifest = manager.export()
+        print(f"Exported snapshot to {args.snapshot_dir}: {manifest['collections']}")
+    else:
+        manager.import_snapshot(force=args.force)
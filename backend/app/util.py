@@ -1,4 +1,5 @@
 from dotenv import load_dotenv
+import json
 import os
 import uuid
 
@@ -38,4 +39,20 @@ class Utilities:
         Returns:
             str: UUID string
         """
-        return str(uuid.uuid4())
\ No newline at end of file
+        return str(uuid.uuid4())
+
+    def write_json_atomic(path: str, data: dict, indent: int = None):
+        """
+        Write JSON to a temporary file and rename it over path, so readers
+        never see a partially written file
+        Args:
+            path: Destination file path
+            data: JSON-serialisable data
+            indent: Optional indent passed to json.dump
+        """
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as output_file:
+            json.dump(data, output_file, indent=indent)
+            output_file.flush()
+            os.fsync(output_file.fileno())
+        os.replace(tmp_path, path)
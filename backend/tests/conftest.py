@@ -0,0 +1,22 @@
+import pytest
+
+
+@pytest.fixture
+def migration_state_path(tmp_path, monkeypatch):
+    """Point MigrationState at a throwaway state file"""
+    path = tmp_path / "migration_state.json"
+    monkeypatch.setenv("MIGRATION_STATE_PATH", str(path))
+    return path
+
+
+@pytest.fixture
+def chroma_client(monkeypatch):
+    """Serve DatabaseUtilities from a fresh in-memory Chroma instead of the HTTP server"""
+    chromadb = pytest.importorskip("chromadb")
+    from chromadb.config import Settings
+    from database_util import DatabaseUtilities
+
+    client = chromadb.EphemeralClient(Settings(allow_reset=True, anonymized_telemetry=False))
+    client.reset()
+    monkeypatch.setattr(DatabaseUtilities, "get_db_client", lambda self: client)
+    return client
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from database_util import DatabaseUtilities
+
+
+def test_export_collection_writes_memmap_and_records(tmp_path, chroma_client):
+    collection = chroma_client.get_or_create_collection("image_collection")
+    collection.add(
+        ids=["a", "b", "c"],
+        embeddings=[[3.0, 4.0], [1.0, 0.0], [0.0, 2.0]],
+        metadatas=[{"path": "s3://a"}, {"path": "s3://b"}, {"path": "s3://c"}],
+        documents=["doc a", "doc b", "doc c"]
+    )
+    path = str(tmp_path / "embeddings.npy")
+
+    records = DatabaseUtilities().export_collection(collection, path, page_size=2,
+                                                    include=['metadatas', 'documents'], normalize=True)
+
+    matrix = np.load(path, mmap_mode='r')
+    assert matrix.shape == (3, 2)
+    rows = dict(zip(records['ids'], matrix))
+    assert np.allclose(rows["a"], [0.6, 0.8])
+    assert np.allclose(np.linalg.norm(matrix, axis=1), 1.0)
+    assert [metadata['path'] for metadata in records['metadatas']] == [f"s3://{image_id}" for image_id in records['ids']]
+    assert len(records['documents']) == 3
+
+
+def test_export_empty_collection(tmp_path, chroma_client):
+    collection = chroma_client.get_or_create_collection("image_collection")
+    path = str(tmp_path / "embeddings.npy")
+
+    records = DatabaseUtilities().export_collection(collection, path)
+
+    assert records == {"ids": []}
+    assert np.load(path).shape == (0, 0)
+
+
+class DeletingCollection:
+    """Wraps a collection and deletes a record after the given number of get calls"""
+
+    def __init__(self, collection, deleted_id, after_calls=1):
+        self.collection = collection
+        self.deleted_id = deleted_id
+        self.after_calls = after_calls
+        self.calls = 0
+
+    def count(self):
+        return self.collection.count()
+
+    def get(self, **kwargs):
+        page = self.collection.get(**kwargs)
+        self.calls += 1
+        if self.calls == self.after_calls:
+            self.collection.delete(ids=[self.deleted_id])
+        return page
+
+
+@pytest.fixture
+def four_records(chroma_client):
+    collection = chroma_client.get_or_create_collection("image_collection")
+    collection.add(ids=["a", "b", "c", "d"], embeddings=[[1.0, 0.0], [0.0, 1.0], [1.0, 1.0], [2.0, 1.0]])
+    return collection
+
+
+def test_export_matches_live_ids_after_delete(tmp_path, four_records):
+    path = str(tmp_path / "embeddings.npy")
+
+    # "a" is deleted once the id list has been read, before its chunk is fetched
+    records = DatabaseUtilities().export_collection(DeletingCollection(four_records, "a"), path, page_size=2)
+
+    assert sorted(records['ids']) == sorted(four_records.get(include=[])['ids']) == ["b", "c", "d"]
+    rows = dict(zip(records['ids'], np.load(path)))
+    assert len(rows) == np.load(path).shape[0] == 3
+    assert np.allclose(rows["c"], [1.0, 1.0])
+    assert np.allclose(rows["d"], [2.0, 1.0])
+
+
+def test_export_keeps_every_live_id_when_delete_follows_first_chunk(tmp_path, four_records):
+    path = str(tmp_path / "embeddings.npy")
+
+    records = DatabaseUtilities().export_collection(DeletingCollection(four_records, "a", after_calls=2), path,
+                                                    page_size=2)
+
+    # "a" was already read, but the live records after it are not skipped
+    assert sorted(records['ids']) == ["a", "b", "c", "d"]
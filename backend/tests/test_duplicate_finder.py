@@ -0,0 +1,135 @@
+import json
+import numpy as np
+import pytest
+from duplicate_finder import DuplicateFinder
+
+
+@pytest.fixture
+def finder(tmp_path, migration_state_path, chroma_client):
+    return DuplicateFinder(output_dir=str(tmp_path), block_size=3, neighbors=2, max_cluster_size=3,
+                           duplicate_threshold=0.95, cluster_threshold=0.8)
+
+
+def write_export(finder, vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.save(finder.embeddings_path, vectors)
+    ids = [f"image_{index}" for index in range(len(vectors))]
+    with open(finder.records_path, 'w') as records_file:
+        json.dump({"ids": ids, "paths": [f"s3://{image_id}" for image_id in ids]}, records_file)
+
+
+def group_ids(groups):
+    return sorted(sorted(group['ids']) for group in groups)
+
+
+def test_union_find_merges_and_compresses(finder):
+    parents = np.arange(5)
+
+    assert finder._union(parents, 3, 4)
+    assert finder._union(parents, 4, 1)
+    assert not finder._union(parents, 3, 1)
+
+    assert finder._find(parents, 3) == 1
+    assert parents[3] == 1
+    assert finder._find(parents, 0) == 0
+
+
+def test_union_respects_max_size(finder):
+    parents = np.arange(4)
+    sizes = np.ones(4, dtype=np.int64)
+
+    assert finder._union(parents, 0, 1, sizes, 3)
+    assert finder._union(parents, 1, 2, sizes, 3)
+    assert not finder._union(parents, 2, 3, sizes, 3)
+    assert sizes[0] == 3
+    assert finder._find(parents, 3) == 3
+
+
+def test_collect_groups_drops_singletons_and_sorts_by_size(finder):
+    parents = np.array([0, 0, 2, 0, 4, 4])
+    ids = [f"image_{index}" for index in range(6)]
+
+    groups = finder._collect_groups(parents, ids, [f"s3://{image_id}" for image_id in ids])
+
+    assert groups == [
+        {"ids": ["image_0", "image_1", "image_3"], "s3_links": ["s3://image_0", "s3://image_1", "s3://image_3"]},
+        {"ids": ["image_4", "image_5"], "s3_links": ["s3://image_4", "s3://image_5"]}
+    ]
+
+
+def test_nearest_neighbors_across_blocks(finder):
+    vectors = np.eye(4, dtype=np.float32)
+    vectors[3] = [1.0, 0.1, 0.0, 0.0]
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    finder.neighbors = 1
+
+    neighbor_idx, neighbor_scores = finder._nearest_neighbors(vectors, 4)
+
+    # Rows 0 and 3 fall in different blocks of 3
+    assert neighbor_idx[0, 0] == 3
+    assert neighbor_idx[3, 0] == 0
+    assert neighbor_scores[0, 0] == pytest.approx(vectors[0] @ vectors[3])
+
+
+def test_find_groups_separates_duplicates_and_clusters(finder):
+    write_export(finder, [
+        [1.0, 0.0, 0.0],
+        [1.0, 0.01, 0.0],
+        [1.0, 0.5, 0.0],
+        [0.0, 0.0, 1.0],
+        [0.0, 1.0, 0.0]
+    ])
+
+    result = finder.find_groups()
+
+    assert result['total_images'] == 5
+    assert group_ids(result['duplicate_groups']) == [["image_0", "image_1"]]
+    assert group_ids(result['clusters']) == [["image_0", "image_1", "image_2"]]
+
+
+def test_find_groups_caps_cluster_size(finder):
+    write_export(finder, [[1.0, 0.02 * index, 0.0] for index in range(6)])
+
+    result = finder.find_groups()
+
+    assert all(len(cluster['ids']) <= 3 for cluster in result['clusters'])
+
+
+def test_failed_scan_records_error(finder, monkeypatch):
+    def broken_export():
+        raise Exception("database unavailable")
+
+    monkeypatch.setattr(finder, "export_embeddings", broken_export)
+
+    with pytest.raises(Exception):
+        finder.run()
+
+    assert finder.status == 'failed'
+    assert finder.last_error['message'] == "database unavailable"
+
+
+def test_get_result_pages_groups(finder, monkeypatch):
+    write_export(finder, [[1.0, 0.0, 0.0], [1.0, 0.01, 0.0], [0.0, 1.0, 0.0], [0.0, 1.0, 0.01]])
+    monkeypatch.setattr(finder, "export_embeddings", lambda: 4)
+    finder.run()
+
+    first = finder.get_result(limit=1, offset=0)
+    second = finder.get_result(limit=1, offset=1)
+
+    assert finder.status == 'idle'
+    assert finder.last_error is None
+    assert first['total_duplicate_groups'] == 2
+    assert len(first['duplicate_groups']) == 1
+    assert first['duplicate_groups'] != second['duplicate_groups']
+    assert finder.get_result(limit=10, offset=2)['duplicate_groups'] == []
+
+
+def test_get_result_without_scan(finder):
+    assert finder.get_result() is None
+
+
+@pytest.mark.parametrize("limit, offset", [(0, 0), (-1, 0), (10, -1)])
+def test_get_result_rejects_invalid_page(finder, limit, offset):
+    with pytest.raises(ValueError):
+        finder.get_result(limit=limit, offset=offset)
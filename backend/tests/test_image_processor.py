@@ -0,0 +1,79 @@
+import asyncio
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from PIL import Image
+import image_processor
+from image_processor import ImageProcessor
+from migration_state import MigrationState
+
+
+class FakeResponse:
+    content = b"image bytes"
+
+
+@pytest.fixture
+def processor(migration_state_path, chroma_client, monkeypatch):
+    def load_models(self, clip_model_name, blip_model_name):
+        self.clip_model_name = clip_model_name
+        self.blip_model_name = blip_model_name
+
+    monkeypatch.setattr(ImageProcessor, "_load_models", load_models)
+    monkeypatch.setattr(ImageProcessor, "_preprocess_image",
+                        lambda self, image, text: ([1.0, 0.0, 0.0], [0.0, 1.0, 0.0]))
+    monkeypatch.setattr(image_processor.requests, "get", lambda url: FakeResponse())
+    monkeypatch.setattr(image_processor.S3Utilities, "upload_to_s3",
+                        lambda self, image: f"http://localhost:4566/my-image-bucket/{image.filename}")
+    processor = ImageProcessor()
+    processor.clip_model_name = processor.blip_model_name = None
+    return processor
+
+
+def test_failed_dual_write_does_not_fail_ingest(processor, monkeypatch):
+    MigrationState().start("openai/clip-vit-large-patch14", "Salesforce/blip-image-captioning-large")
+
+    def broken_target(migration):
+        raise Exception("target collection unavailable")
+
+    monkeypatch.setattr(processor, "_get_target_processor", broken_target)
+
+    image_id = processor._store_image(Image.new("RGB", (4, 4)), "http://example.com/cat.jpg", "a cat")
+
+    assert processor.image_collection.get(ids=[image_id])['ids'] == [image_id]
+    assert processor.text_collection.get(ids=[image_id])['ids'] == [image_id]
+
+
+def test_ingest_overlapping_switch_over_reaches_new_live_collections(processor, monkeypatch):
+    MigrationState().start("openai/clip-vit-large-patch14", "Salesforce/blip-image-captioning-large")
+    monkeypatch.setattr(image_processor.Image, "open", lambda data: Image.new("RGB", (4, 4)))
+    switched = []
+
+    def caption_then_switch(self, image):
+        # The reindex job switches over while the old models are still captioning
+        if not switched:
+            switched.append(MigrationState().switch_over())
+        return "a cat"
+
+    monkeypatch.setattr(ImageProcessor, "generate_description", caption_then_switch)
+
+    image_id = asyncio.run(processor.process_image_url("http://example.com/cat.jpg"))
+
+    target = processor._target_processor
+    assert target.image_collection_name == "image_collection_v2"
+    assert target.image_collection.get(ids=[image_id])['ids'] == [image_id]
+    assert target.text_collection.get(ids=[image_id])['ids'] == [image_id]
+
+
+def test_failed_write_to_new_live_collections_fails_ingest(processor, monkeypatch):
+    MigrationState().start("openai/clip-vit-large-patch14", "Salesforce/blip-image-captioning-large")
+    MigrationState().switch_over()
+
+    def broken_target(migration):
+        raise Exception("target collection unavailable")
+
+    monkeypatch.setattr(processor, "_get_target_processor", broken_target)
+
+    with pytest.raises(Exception, match="target collection unavailable"):
+        processor._store_image(Image.new("RGB", (4, 4)), "http://example.com/cat.jpg", "a cat")
@@ -0,0 +1,88 @@
+import json
+import pytest
+from migration_state import MigrationState, DEFAULT_CLIP_MODEL, DEFAULT_BLIP_MODEL
+
+NEW_CLIP = "openai/clip-vit-large-patch14"
+NEW_BLIP = "Salesforce/blip-image-captioning-large"
+
+
+def test_load_defaults_without_state_file(migration_state_path):
+    state = MigrationState().load()
+
+    assert state['version'] == 1
+    assert state['clip_model'] == DEFAULT_CLIP_MODEL
+    assert state['blip_model'] == DEFAULT_BLIP_MODEL
+    assert state['image_collection'] == "image_collection"
+    assert state['migration'] is None
+
+
+def test_start_creates_versioned_target(migration_state_path):
+    migration = MigrationState().start(NEW_CLIP, NEW_BLIP)
+
+    assert migration['version'] == 2
+    assert migration['image_collection'] == "image_collection_v2"
+    assert migration['text_collection'] == "text_collection_v2"
+    assert migration['offset'] == 0
+    assert json.loads(migration_state_path.read_text())['migration'] == migration
+
+
+def test_start_resumes_same_migration(migration_state_path):
+    state = MigrationState()
+    state.start(NEW_CLIP, NEW_BLIP)
+    state.update_checkpoint(512, 500)
+
+    migration = state.start(NEW_CLIP, NEW_BLIP)
+
+    assert migration['offset'] == 512
+    assert migration['processed'] == 500
+
+
+def test_start_rejects_different_migration_in_progress(migration_state_path):
+    state = MigrationState()
+    state.start(NEW_CLIP, NEW_BLIP)
+
+    with pytest.raises(Exception, match="already in progress"):
+        state.start("openai/clip-vit-base-patch16", NEW_BLIP)
+
+
+def test_start_rejects_old_version(migration_state_path):
+    with pytest.raises(Exception, match="must be newer"):
+        MigrationState().start(NEW_CLIP, NEW_BLIP, version=1)
+
+
+def test_update_checkpoint_requires_migration(migration_state_path):
+    with pytest.raises(Exception, match="No migration"):
+        MigrationState().update_checkpoint(10, 10)
+
+
+def test_switch_over_makes_target_live(migration_state_path):
+    state = MigrationState()
+    state.start(NEW_CLIP, NEW_BLIP)
+
+    new_state = state.switch_over()
+
+    assert new_state == state.load()
+    assert new_state['version'] == 2
+    assert new_state['clip_model'] == NEW_CLIP
+    assert new_state['blip_model'] == NEW_BLIP
+    assert new_state['image_collection'] == "image_collection_v2"
+    assert new_state['text_collection'] == "text_collection_v2"
+    assert new_state['previous']['image_collection'] == "image_collection"
+    assert new_state['migration'] is None
+
+
+def test_switch_over_requires_migration(migration_state_path):
+    with pytest.raises(Exception, match="No migration"):
+        MigrationState().switch_over()
+
+
+def test_abort_keeps_live_collections(migration_state_path):
+    state = MigrationState()
+    state.start(NEW_CLIP, NEW_BLIP)
+
+    state.abort()
+
+    loaded = state.load()
+    assert loaded['migration'] is None
+    assert loaded['image_collection'] == "image_collection"
+    assert loaded['clip_model'] == DEFAULT_CLIP_MODEL
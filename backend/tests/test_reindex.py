@@ -0,0 +1,140 @@
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from PIL import Image
+from image_processor import ImageProcessor
+from migration_state import MigrationState
+from reindex import ReindexJob
+
+NEW_CLIP = "openai/clip-vit-large-patch14"
+NEW_BLIP = "Salesforce/blip-image-captioning-large"
+
+
+@pytest.fixture
+def stub_models(monkeypatch):
+    """Skip loading CLIP/BLIP weights and return fixed embeddings instead"""
+    def load_models(self, clip_model_name, blip_model_name):
+        self.clip_model_name = clip_model_name
+        self.blip_model_name = blip_model_name
+
+    def preprocess_batch(self, images, texts):
+        return [[1.0, 0.0, 0.0]] * len(images), [[0.0, 1.0, 0.0]] * len(texts)
+
+    monkeypatch.setattr(ImageProcessor, "_load_models", load_models)
+    monkeypatch.setattr(ImageProcessor, "_preprocess_batch", preprocess_batch)
+    monkeypatch.setattr(ImageProcessor, "generate_descriptions", lambda self, images: ["a new cat"] * len(images))
+    monkeypatch.setattr(ReindexJob, "_load_image", lambda self, metadata: Image.new("RGB", (4, 4)))
+
+
+def add_source_records(client, count):
+    collection = client.get_or_create_collection("image_collection")
+    ids = [f"image_{index}" for index in range(count)]
+    collection.add(
+        ids=ids,
+        embeddings=[[0.0, 0.0, 1.0]] * count,
+        metadatas=[{"path": f"http://localhost:4566/my-image-bucket/{image_id}.jpg", "description": "a cat"}
+                   for image_id in ids],
+        documents=[f"http://example.com/{image_id}.jpg" for image_id in ids]
+    )
+    return ids
+
+
+def test_job_builds_target_processor(migration_state_path, chroma_client, stub_models):
+    job = ReindexJob(NEW_CLIP, NEW_BLIP, page_size=2, batch_size=2)
+    job.run()
+
+    assert job.target.clip_model_name == NEW_CLIP
+    assert job.target.image_collection_name == "image_collection_v2"
+
+
+def test_job_reindexes_and_switches_over(migration_state_path, chroma_client, stub_models):
+    ids = add_source_records(chroma_client, 5)
+
+    new_state = ReindexJob(NEW_CLIP, NEW_BLIP, page_size=2, batch_size=2).run()
+
+    assert new_state['image_collection'] == "image_collection_v2"
+    assert new_state['clip_model'] == NEW_CLIP
+    assert MigrationState().load()['migration'] is None
+    target = chroma_client.get_collection("image_collection_v2")
+    assert sorted(target.get()['ids']) == sorted(ids)
+    assert chroma_client.get_collection("text_collection_v2").count() == 5
+
+
+def test_job_refuses_to_switch_over_with_missing_images(migration_state_path, chroma_client, stub_models,
+                                                        monkeypatch):
+    add_source_records(chroma_client, 3)
+
+    def load_image(self, metadata):
+        if "image_1" in metadata['path']:
+            raise Exception("NoSuchKey")
+        return Image.new("RGB", (4, 4))
+
+    monkeypatch.setattr(ReindexJob, "_load_image", load_image)
+
+    job = ReindexJob(NEW_CLIP, NEW_BLIP)
+    with pytest.raises(Exception, match="image_1"):
+        job.run()
+
+    state = MigrationState().load()
+    assert state['image_collection'] == "image_collection"
+    assert state['migration'] is not None
+    assert "NoSuchKey" in job.failed["image_1"]
+
+
+def test_job_switches_over_with_missing_images_when_allowed(migration_state_path, chroma_client, stub_models,
+                                                            monkeypatch):
+    add_source_records(chroma_client, 3)
+
+    def load_image(self, metadata):
+        if "image_1" in metadata['path']:
+            raise Exception("NoSuchKey")
+        return Image.new("RGB", (4, 4))
+
+    monkeypatch.setattr(ReindexJob, "_load_image", load_image)
+
+    new_state = ReindexJob(NEW_CLIP, NEW_BLIP, allow_missing=True).run()
+
+    assert new_state['image_collection'] == "image_collection_v2"
+    assert chroma_client.get_collection("image_collection_v2").count() == 2
+
+
+def test_job_removes_images_deleted_during_migration(migration_state_path, chroma_client, stub_models,
+                                                     monkeypatch):
+    add_source_records(chroma_client, 3)
+    source = chroma_client.get_collection("image_collection")
+    reindex_batch = ReindexJob._reindex_batch
+
+    def reindex_after_delete(self, ids, metadatas, documents):
+        # Simulate delete_image running after the page was read but before it is upserted
+        if "image_2" in ids:
+            source.delete(ids=["image_2"])
+        return reindex_batch(self, ids, metadatas, documents)
+
+    monkeypatch.setattr(ReindexJob, "_reindex_batch", reindex_after_delete)
+
+    ReindexJob(NEW_CLIP, NEW_BLIP).run()
+
+    assert sorted(chroma_client.get_collection("image_collection_v2").get()['ids']) == ["image_0", "image_1"]
+    assert sorted(chroma_client.get_collection("text_collection_v2").get()['ids']) == ["image_0", "image_1"]
+
+
+def test_job_catches_up_ingests_missed_before_switch_over(migration_state_path, chroma_client, stub_models,
+                                                          monkeypatch):
+    add_source_records(chroma_client, 2)
+    source = chroma_client.get_collection("image_collection")
+    switch_over = MigrationState.switch_over
+
+    def ingest_then_switch(self):
+        # An ingest lands in the old collections and its dual write fails
+        source.add(ids=["late"], embeddings=[[0.0, 0.0, 1.0]],
+                   metadatas=[{"path": "http://localhost:4566/my-image-bucket/late.jpg", "description": "a dog"}],
+                   documents=["http://example.com/late.jpg"])
+        return switch_over(self)
+
+    monkeypatch.setattr(MigrationState, "switch_over", ingest_then_switch)
+
+    ReindexJob(NEW_CLIP, NEW_BLIP).run()
+
+    assert sorted(chroma_client.get_collection("image_collection_v2").get()['ids']) == ["image_0", "image_1", "late"]
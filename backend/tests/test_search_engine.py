@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from migration_state import MigrationState
+from search_engine import SearchEngine
+from snapshot import SnapshotCollection, SnapshotManager
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path, migration_state_path, chroma_client, monkeypatch):
+    """Export a small snapshot, then empty the database as on a cold node"""
+    images = chroma_client.get_or_create_collection("image_collection")
+    images.add(ids=["a", "b"], embeddings=[[1.0, 0.0], [0.0, 1.0]],
+               metadatas=[{"path": "s3://a"}, {"path": "s3://b"}], documents=["url a", "url b"])
+    texts = chroma_client.get_or_create_collection("text_collection")
+    texts.add(ids=["a", "b"], embeddings=[[0.5, 0.5], [0.2, 0.8]], documents=["a cat", "a dog"])
+
+    path = str(tmp_path / "snapshot")
+    SnapshotManager(path).export()
+    chroma_client.delete_collection("image_collection")
+    chroma_client.delete_collection("text_collection")
+    monkeypatch.setenv("SNAPSHOT_DIR", path)
+    return path
+
+
+def test_warm_start_waits_for_import_marker(snapshot_dir, chroma_client):
+    engine = SearchEngine()
+    assert engine.serving_snapshot
+    assert isinstance(engine.text_collection, SnapshotCollection)
+
+    # Images loaded but text not yet: keep serving the snapshot
+    chroma_client.get_collection("image_collection").add(
+        ids=["a", "b"], embeddings=[[1.0, 0.0], [0.0, 1.0]])
+    engine._sync_collections()
+    assert engine.serving_snapshot
+
+    MigrationState().mark_snapshot_imported(engine.snapshot_id, "image_collection", "text_collection")
+    engine._sync_collections()
+
+    assert not engine.serving_snapshot
+    assert engine.text_collection is engine.db_text_collection
+
+
+def test_warm_start_skipped_once_snapshot_imported(snapshot_dir):
+    SnapshotManager(snapshot_dir).import_snapshot()
+
+    engine = SearchEngine()
+
+    assert not engine.serving_snapshot
+
+
+def test_delete_rejected_while_serving_snapshot(snapshot_dir, monkeypatch):
+    engine = SearchEngine()
+    deleted = []
+    monkeypatch.setattr(engine.s3_util.s3_client, "delete_object", lambda **kwargs: deleted.append(kwargs))
+
+    result = asyncio.run(engine.delete_image("a"))
+
+    assert result['status'] == 'error'
+    assert "snapshot" in result['message']
+    assert deleted == []
+    assert engine.image_collection.get(ids=["a"])['ids'] == ["a"]
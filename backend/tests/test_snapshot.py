@@ -0,0 +1,102 @@
+import json
+import os
+import numpy as np
+import pytest
+from snapshot import SnapshotCollection
+
+
+def write_snapshot(snapshot_dir, role, ids, embeddings, metadatas=None, documents=None):
+    output_dir = os.path.join(snapshot_dir, role)
+    os.makedirs(output_dir, exist_ok=True)
+    np.save(os.path.join(output_dir, 'embeddings.npy'), np.asarray(embeddings, dtype=np.float32))
+    with open(os.path.join(output_dir, 'records.json'), 'w') as records_file:
+        json.dump({
+            "ids": ids,
+            "documents": documents or [f"doc {image_id}" for image_id in ids],
+            "metadatas": metadatas or {"path": [f"s3://{image_id}" for image_id in ids]}
+        }, records_file)
+
+
+def test_query_ignores_rows_past_last_id(tmp_path):
+    # A matrix with a trailing all-zero row, as left by an export that raced a delete
+    write_snapshot(str(tmp_path), 'image', ["a", "b"], [[1.0, 0.0], [0.0, 1.0], [0.0, 0.0]])
+    collection = SnapshotCollection(str(tmp_path), 'image', block_size=4)
+
+    result = collection.query(query_embeddings=[[0.1, 0.1]], n_results=5, include=['distances'])
+
+    assert sorted(result['ids'][0]) == ["a", "b"]
+    assert len(collection.squared_norms) == 2
+
+
+def test_export_import_round_trip_marks_import_complete(tmp_path, migration_state_path, chroma_client):
+    from migration_state import MigrationState
+    from snapshot import SnapshotManager
+
+    images = chroma_client.get_or_create_collection("image_collection")
+    images.add(ids=["a", "b"], embeddings=[[1.0, 0.0], [0.0, 1.0]],
+               metadatas=[{"path": "s3://a", "width": 4}, {"path": "s3://b"}], documents=["url a", "url b"])
+    texts = chroma_client.get_or_create_collection("text_collection")
+    texts.add(ids=["a", "b"], embeddings=[[0.5, 0.5], [0.2, 0.8]], documents=["a cat", "a dog"])
+
+    snapshot_dir = str(tmp_path / "snapshot")
+    manifest = SnapshotManager(snapshot_dir, page_size=1).export()
+    assert manifest['collections'] == {"image": {"count": 2, "dimension": 2},
+                                       "text": {"count": 2, "dimension": 2}}
+
+    chroma_client.delete_collection("image_collection")
+    chroma_client.delete_collection("text_collection")
+    assert MigrationState().load().get('snapshot_import') is None
+
+    added = SnapshotManager(snapshot_dir, chunk_size=1).import_snapshot()
+
+    assert added == {"image": 2, "text": 2}
+    restored = chroma_client.get_collection("image_collection").get(ids=["a", "b"], include=['metadatas'])
+    assert restored['metadatas'] == [{"path": "s3://a", "width": 4}, {"path": "s3://b"}]
+    assert chroma_client.get_collection("text_collection").count() == 2
+    assert MigrationState().load()['snapshot_import'] == {
+        "snapshot_id": manifest['snapshot_id'],
+        "image_collection": "image_collection",
+        "text_collection": "text_collection"
+    }
+
+
+@pytest.fixture
+def snapshot_collection(tmp_path):
+    ids = ["a", "b", "c", "d", "e"]
+    embeddings = [[1.0, 0.0], [0.0, 1.0], [0.9, 0.1], [-1.0, 0.0], [0.6, 0.4]]
+    write_snapshot(str(tmp_path), 'image', ids, embeddings,
+                   metadatas={"path": [f"s3://{image_id}" for image_id in ids], "width": [1, None, 3, None, 5]})
+    return SnapshotCollection(str(tmp_path), 'image', block_size=2)
+
+
+def test_query_orders_by_distance_across_blocks(snapshot_collection):
+    result = snapshot_collection.query(query_embeddings=[[1.0, 0.0]], n_results=3,
+                                       include=['distances', 'metadatas'])
+
+    assert result['ids'] == [["a", "c", "e"]]
+    assert result['distances'][0] == pytest.approx([0.0, 0.02, 0.32])
+    assert result['metadatas'][0][0] == {"path": "s3://a", "width": 1}
+
+
+def test_query_handles_each_embedding_and_small_collections(snapshot_collection):
+    result = snapshot_collection.query(query_embeddings=[[0.0, 1.0], [-1.0, 0.0]], n_results=10,
+                                       include=['distances'])
+
+    assert result['ids'][0][0] == "b"
+    assert result['ids'][1][0] == "d"
+    assert len(result['ids'][0]) == 5
+    assert result['distances'][1] == sorted(result['distances'][1])
+
+
+def test_get_keeps_requested_order_and_skips_unknown_ids(snapshot_collection):
+    result = snapshot_collection.get(ids=["c", "missing", "a"], include=['metadatas', 'documents'])
+
+    assert result['ids'] == ["c", "a"]
+    assert result['documents'] == ["doc c", "doc a"]
+    assert result['metadatas'][1] == {"path": "s3://a", "width": 1}
+    assert snapshot_collection.count() == 5
+
+
+def test_snapshot_collection_is_read_only(snapshot_collection):
+    with pytest.raises(Exception, match="read-only"):
+        snapshot_collection.delete(ids=["a"])